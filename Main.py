@@ -1,212 +1,291 @@
 import argparse
-from collections import defaultdict
+from bisect import bisect_left
+from collections import Counter
+from itertools import accumulate, chain
 import struct
+import sys
 
-class Node:
-    def __init__(self, freq, char=None, left=None, right=None):
-        self.freq = freq  # Частота символа
-        self.char = char  # Символ (для листьев)
-        self.left = left  # Левый потомок
-        self.right = right  # Правый потомок
+# Дерево хранится в трех параллельных списках (left, right, symbol), корень - узел 0.
+# У внутренних узлов symbol == -1, у листьев left и right равны -1.
+def _add_node(tree, symbol):
+    left, right, symbols = tree
+    left.append(-1)
+    right.append(-1)
+    symbols.append(symbol)
+    return len(symbols) - 1
 
-    def __lt__(self, other):
-        return self.freq < other.freq
+def build_frequency_table(data):
+    # Подсчет по байтам выполняется внутри Counter на C
+    return Counter(data)
 
-def build_frequency_table(text):
-    frequency = defaultdict(int)
-    for char in text:
-        frequency[char] += 1
-    return frequency
+# Биты каждого байта, начиная со старшего
+_BYTE_BITS = tuple(tuple((byte >> shift) & 1 for shift in range(7, -1, -1)) for byte in range(256))
 
-# -------------------- Шеннон–Фано --------------------
-def _split_index_by_balance(pairs):
-    if not pairs:
-        return 0
-    total = sum(freq for _, freq in pairs)
-    running = 0
-    best_i = 1
-    best_diff = float('inf')
-    for i in range(1, len(pairs)):
-        running += pairs[i-1][1]
-        diff = abs(total/2 - running)
-        if diff < best_diff:
-            best_diff = diff
-            best_i = i
-    return best_i
+# Число 16-битных слов входа, кодируемых за один блок
+_ENCODE_BLOCK_WORDS = 1 << 15
 
-def _build_fano_from_sorted(pairs):
-    if not pairs:
-        return None
-    if len(pairs) == 1:
-        ch, fr = pairs[0]
-        return Node(fr, ch)
-    i = _split_index_by_balance(pairs)
-    left_pairs = pairs[:i]
-    right_pairs = pairs[i:]
-    left = _build_fano_from_sorted(left_pairs)
-    right = _build_fano_from_sorted(right_pairs)
-    return Node(sum(freq for _, freq in pairs), None, left, right)
+# -------------------- Шеннон–Фано --------------------
+def _split_index_by_balance(cum, lo, hi):
+    # Граница разбиения pairs[lo:hi]: сумма левой части ближе всего к половине.
+    # cum - префиксные суммы частот, поэтому кандидат ищется бинарным поиском.
+    base = cum[lo - 1] if lo else 0
+    total2 = base + cum[hi - 1]  # удвоенная середина диапазона
+    j = bisect_left(cum, (total2 + 1) // 2, lo, hi - 1)
+    if j > lo and (j == hi - 1 or total2 - 2 * cum[j - 1] <= 2 * cum[j] - total2):
+        j -= 1
+    return j + 1
 
 def build_fano_tree(frequency):
     pairs = sorted(frequency.items(), key=lambda kv: kv[1], reverse=True)
     if len(pairs) == 0:
         return None
-    return _build_fano_from_sorted(pairs)
+    cum = list(accumulate(freq for _, freq in pairs))
+    tree = ([], [], [])
+    # Элемент стека: диапазон pairs[lo:hi], родитель и сторона (0 - левый, 1 - правый).
+    # Левое поддерево снимается со стека первым, поэтому узлы нумеруются в прямом порядке.
+    stack = [(0, len(pairs), -1, 0)]
+    while stack:
+        lo, hi, parent, side = stack.pop()
+        if hi - lo == 1:
+            node = _add_node(tree, pairs[lo][0])
+        else:
+            node = _add_node(tree, -1)
+            i = _split_index_by_balance(cum, lo, hi)
+            stack.append((i, hi, node, 1))
+            stack.append((lo, i, node, 0))
+        if parent >= 0:
+            tree[side][parent] = node
+    return tree
 # -----------------------------------------------------
 
-def build_codes_iterative(root):
+def build_codes_iterative(tree):
     codebook = {}
-    if root is None:
+    if tree is None:
         return codebook
-    stack = [(root, "")]
+    left, right, symbol = tree
+    stack = [(0, "")]
     while stack:
         node, prefix = stack.pop()
-        if node.char is not None:
-            codebook[node.char] = prefix or "0"
+        if symbol[node] >= 0:
+            codebook[symbol[node]] = prefix or "0"
         else:
-            if node.right:
-                stack.append((node.right, prefix + "1"))
-            if node.left:
-                stack.append((node.left, prefix + "0"))
+            if right[node] >= 0:
+                stack.append((right[node], prefix + "1"))
+            if left[node] >= 0:
+                stack.append((left[node], prefix + "0"))
     return codebook
 
-def encode(text, codebook):
-    return ''.join(codebook[char] for char in text)
+def build_encode_table(codebook):
+    # Таблица пар байт -> код пары. Индекс совпадает со значением
+    # 16-битного слова в родном порядке байт (см. memoryview.cast('H')).
+    table = [None] * 65536
+    little = sys.byteorder == 'little'
+    for first, first_code in codebook.items():
+        for second, second_code in codebook.items():
+            index = first | (second << 8) if little else (first << 8) | second
+            table[index] = first_code + second_code
+    return table
+
+def encode_packed(data, codebook, num_bits):
+    # Кодирование совмещено с упаковкой: строка из '0'/'1' строится только
+    # для одного блока входа и сразу переводится в байты. Хвост блока, не
+    # кратный 8 битам, переносится в следующий блок.
+    # Данные читаются 16-битными словами: вдвое меньше итераций интерпретатора.
+    # Размер результата известен заранее, поэтому буфер выделяется один раз.
+    table = build_encode_table(codebook)
+    words = memoryview(data)[:len(data) & ~1].cast('H')
+    packed = bytearray((num_bits + 7) // 8)
+    j = 0
+    carry = ''
+    for start in range(0, len(words), _ENCODE_BLOCK_WORDS):
+        block = words[start:start + _ENCODE_BLOCK_WORDS]
+        bits = carry + ''.join([table[pair] for pair in block])
+        whole = len(bits) // 8
+        if whole:
+            packed[j:j + whole] = int(bits[:whole * 8], 2).to_bytes(whole, 'big')
+            j += whole
+        carry = bits[whole * 8:]
+    if len(data) & 1:
+        carry += codebook[data[-1]]
+    if carry:
+        padding = (8 - len(carry) % 8) % 8
+        packed[j:] = (int(carry, 2) << padding).to_bytes((len(carry) + padding) // 8, 'big')
+    return packed
 
-def decode(encoded_bits, root):
+def build_decode_table(tree):
+    # Состояние автомата - внутренний узел, с которого продолжается спуск.
+    # Для каждой пары (состояние, байт) заранее известны новое состояние
+    # и символы, выданные при спуске по 8 битам этого байта.
+    left, right, symbol = tree
+    nodes = [0]
+    state_of = [0] * len(symbol)
+    i = 0
+    while i < len(nodes):
+        for child in (left[nodes[i]], right[nodes[i]]):
+            if child >= 0 and symbol[child] < 0:
+                state_of[child] = len(nodes)
+                nodes.append(child)
+        i += 1
+    # Переходы для всех 256 байт строятся раскрытием префиксов по уровням:
+    # общий префикс проходится по дереву один раз, а не для каждого байта.
+    # Символы хранятся как str в latin-1: ''.join заметно быстрее b''.join.
+    table = []
+    for start in nodes:
+        level = [(start, '')]
+        for _ in range(8):
+            next_level = []
+            for node, chars in level:
+                for child in (left[node], right[node]):
+                    if symbol[child] >= 0:
+                        next_level.append((0, chars + chr(symbol[child])))
+                    else:
+                        next_level.append((child, chars))
+            level = next_level
+        # Состояние хранится сдвинутым на 8 бит, чтобы индекс был state | byte
+        table.extend([(state_of[node] << 8, chars) for node, chars in level])
+    return table, nodes
+
+def decode_packed(payload, num_bits, tree):
+    left, right, symbol = tree
+    if symbol[0] >= 0:
+        # Дерево из одного листа: каждый бит кодирует этот символ
+        return bytes([symbol[0]]) * num_bits
+    table, nodes = build_decode_table(tree)
+    full_bytes, tail_bits = divmod(num_bits, 8)
     decoded = []
-    node = root
-    for bit in encoded_bits:
-        node = node.left if bit == '0' else node.right
-        if node.char is not None:
-            decoded.append(node.char)
-            node = root
-    return ''.join(decoded)
+    state = 0
+    for byte in payload[:full_bytes]:
+        state, chars = table[state | byte]
+        decoded.append(chars)
+    if tail_bits:
+        # Неполный последний байт проходим побитно, чтобы не декодировать выравнивание
+        node = nodes[state >> 8]
+        chars = []
+        for bit in _BYTE_BITS[payload[full_bytes]][:tail_bits]:
+            node = right[node] if bit else left[node]
+            if symbol[node] >= 0:
+                chars.append(symbol[node])
+                node = 0
+        decoded.append(bytes(chars).decode('latin-1'))
+    return ''.join(decoded).encode('latin-1')
 
-def serialize_tree_iterative(root):
-    bits = []
-    stack = [root]
+def serialize_tree_iterative(tree):
+    # Биты накапливаются сразу в целом числе: лист - '1' и 8 бит символа, узел - '0'
+    left, right, symbol = tree
+    acc = 0
+    nbits = 0
+    stack = [0]
     while stack:
         node = stack.pop()
-        if node.char is not None:
-            bits.append('1')
-            char_bits = format(ord(node.char), '08b')
-            bits.extend(char_bits)
+        if symbol[node] >= 0:
+            acc = (acc << 9) | 0x100 | symbol[node]
+            nbits += 9
         else:
-            bits.append('0')
-            if node.right:
-                stack.append(node.right)
-            if node.left:
-                stack.append(node.left)
-    bit_string = ''.join(bits)
-    return bit_string_to_bytes(bit_string)
+            acc <<= 1
+            nbits += 1
+            if right[node] >= 0:
+                stack.append(right[node])
+            if left[node] >= 0:
+                stack.append(left[node])
+    padding = (8 - nbits % 8) % 8
+    return bytes([padding]) + (acc << padding).to_bytes((nbits + padding) // 8, 'big')
 
 def deserialize_tree_iterative(bit_bytes):
-    bit_string = bytes_to_bit_string(bit_bytes)
-    it = iter(bit_string)
+    padding = bit_bytes[0]
+    # Все биты разворачиваются сразу через таблицу байт -> 8 бит
+    bits = list(chain.from_iterable(map(_BYTE_BITS.__getitem__, bit_bytes[1:])))
+    num_bits = len(bits) - padding
+    tree = ([], [], [])
+    left, right, symbol = tree
     stack = []
-    root = None
-    try:
-        while True:
-            bit = next(it)
-            if bit == '1':
-                char_bits = ''.join(next(it) for _ in range(8))
-                leaf = Node(0, chr(int(char_bits, 2)))
-                if not stack:
-                    root = leaf
-                else:
-                    parent = stack[-1]
-                    if parent.left is None:
-                        parent.left = leaf
-                    elif parent.right is None:
-                        parent.right = leaf
-                        stack.pop()
-            else:  # bit == '0'
-                internal = Node(0, None)
-                if not stack:
-                    root = internal
-                else:
-                    parent = stack[-1]
-                    if parent.left is None:
-                        parent.left = internal
-                    elif parent.right is None:
-                        parent.right = internal
-                        stack.pop()
-                stack.append(internal)
-    except StopIteration:
-        pass
-    return root
-
-def bit_string_to_bytes(s):
-    padding = (8 - len(s) % 8) % 8
-    s += '0' * padding
-    byte_array = bytearray()
-    for i in range(0, len(s), 8):
-        byte = s[i:i+8]
-        byte_array.append(int(byte, 2))
-    return bytes([padding]) + bytes(byte_array)
+    pos = 0
+    while pos < num_bits:
+        pos += 1
+        if bits[pos - 1]:
+            if pos + 8 > num_bits:  # оборванный лист
+                break
+            char = 0
+            for bit in bits[pos:pos + 8]:
+                char = (char << 1) | bit
+            pos += 8
+            node = _add_node(tree, char)
+        else:
+            node = _add_node(tree, -1)
+        if stack:
+            parent = stack[-1]
+            if left[parent] < 0:
+                left[parent] = node
+            else:
+                right[parent] = node
+                stack.pop()
+        if symbol[node] < 0:
+            stack.append(node)
+    return tree if symbol else None
 
-def bytes_to_bit_string(b):
-    padding = b[0]
-    bit_string = ''.join(f'{byte:08b}' for byte in b[1:])
-    if padding > 0:
-        bit_string = bit_string[:-padding]
-    return bit_string
-
-def save_encoded_file(encoded_bits, tree_bits, output_file):
-    with open(output_file, 'wb') as f:
-        tree_length = len(tree_bits)
-        f.write(struct.pack('>I', tree_length))  # 4 байта для длины
-        f.write(tree_bits)
-        f.write(encoded_bits)
+def save_encoded_file(payload, num_bits, tree_bits, output_file):
+    # Заголовок, дерево и данные передаются одним вызовом через буфер в 1 МиБ
+    with open(output_file, 'wb', buffering=1 << 20) as f:
+        tree_length = struct.pack('>I', len(tree_bits))  # 4 байта для длины
+        padding = bytes([(8 - num_bits % 8) % 8])
+        f.writelines([tree_length, tree_bits, padding, payload])
 
 def load_encoded_file(input_file):
+    # Файл читается целиком одним вызовом, части выделяются срезами memoryview без копирования
     with open(input_file, 'rb') as f:
-        tree_length_bytes = f.read(4)
-        if len(tree_length_bytes) < 4:
-            raise ValueError("Файл поврежден или некорректен.")
-        tree_length = struct.unpack('>I', tree_length_bytes)[0]
-        tree_bits = f.read(tree_length)
-        encoded_bits = f.read()
-    return tree_bits, encoded_bits
+        content = memoryview(f.read())
+    if len(content) < 4:
+        raise ValueError("Файл поврежден или некорректен.")
+    tree_length = struct.unpack_from('>I', content)[0]
+    tree_bits = content[4:4 + tree_length]
+    padding = content[4 + tree_length]
+    payload = content[5 + tree_length:]
+    return tree_bits, payload, len(payload) * 8 - padding
 
 def display_codes(codebook):
-    print("Коды Шеннона–Фано:")
-    for char, code in sorted(codebook.items()):
+    # Строки собираются в список и выводятся одной записью
+    lines = ["Коды Шеннона–Фано:"]
+    for byte, code in sorted(codebook.items()):
+        char = chr(byte)
         if char == ' ':
             display_char = "' ' (пробел)"
         elif char == '\n':
             display_char = "'\\n' (новая строка)"
         else:
             display_char = repr(char)
-        print(f"{display_char}: {code}")
+        lines.append(f"{display_char}: {code}")
+    lines.append('')
+    sys.stdout.write('\n'.join(lines))
 
-def display_tree_iterative(root):
-    stack = [(root, '')]
+def display_tree_iterative(tree):
+    left, right, symbol = tree
+    lines = []
+    stack = [(0, '')]
     while stack:
         node, prefix = stack.pop()
-        if node.char is not None:
-            print(f"{prefix}Leaf: {repr(node.char)}")
+        if symbol[node] >= 0:
+            lines.append(f"{prefix}Leaf: {repr(chr(symbol[node]))}")
         else:
-            print(f"{prefix}Node:")
-            if node.right:
-                stack.append((node.right, prefix + " 1-"))
-            if node.left:
-                stack.append((node.left, prefix + " 0-"))
+            lines.append(f"{prefix}Node:")
+            if right[node] >= 0:
+                stack.append((right[node], prefix + " 1-"))
+            if left[node] >= 0:
+                stack.append((left[node], prefix + " 0-"))
+    lines.append('')
+    sys.stdout.write('\n'.join(lines))
 
 def encode_file(input_file, output_file, display=False, display_tree_flag=False):
-    with open(input_file, 'r', encoding='ascii') as f:
-        text = f.read()
-    frequency = build_frequency_table(text)
+    with open(input_file, 'rb') as f:
+        data = f.read()
+    frequency = build_frequency_table(data)
     tree = build_fano_tree(frequency)
     if tree is None:
         print("Входной файл пуст.")
         return
     codebook = build_codes_iterative(tree)
-    encoded_bit_string = encode(text, codebook)
-    encoded_bits = bit_string_to_bytes(encoded_bit_string)
+    num_bits = sum(frequency[char] * len(code) for char, code in codebook.items())
+    payload = encode_packed(data, codebook, num_bits)
     tree_bits = serialize_tree_iterative(tree)
-    save_encoded_file(encoded_bits, tree_bits, output_file)
+    save_encoded_file(payload, num_bits, tree_bits, output_file)
     if display:
         display_codes(codebook)
     if display_tree_flag:
@@ -214,7 +293,7 @@ def encode_file(input_file, output_file, display=False, display_tree_flag=False)
         display_tree_iterative(tree)
 
 def decode_file(input_file, output_file, display=False, display_tree_flag=False):
-    tree_bits, encoded_bits = load_encoded_file(input_file)
+    tree_bits, payload, num_bits = load_encoded_file(input_file)
     tree = deserialize_tree_iterative(tree_bits)
     if tree is None:
         print("Входной файл не содержит данных для декодирования.")
@@ -222,13 +301,12 @@ def decode_file(input_file, output_file, display=False, display_tree_flag=False)
     if display_tree_flag:
         print("Дерево Шеннона–Фано:")
         display_tree_iterative(tree)
-    encoded_bit_string = bytes_to_bit_string(encoded_bits)
-    decoded_text = decode(encoded_bit_string, tree)
-    with open(output_file, 'w', encoding='ascii') as f:
+    decoded_text = decode_packed(payload, num_bits, tree)
+    with open(output_file, 'wb') as f:
         f.write(decoded_text)
     if display:
         print("Декодированный текст:")
-        print(decoded_text)
+        print(decoded_text.decode('ascii', errors='replace'))
 
 def main():
     parser = argparse.ArgumentParser(description="Система кодирования и декодирования с использованием алгоритма Шеннона–Фано.")